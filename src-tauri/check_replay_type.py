@@ -2,53 +2,178 @@
 """
 Simple script to check if a SC2 replay is a 1v1 game.
 Exits with code 0 if 1v1, code 1 if not 1v1, code 2 on error.
-Prints game_type to stdout for debugging.
+Errors are reported on one line; --debug or LL_DEBUG=1 adds the traceback.
+Prints non-observer team sizes to stderr for debugging.
+
+Only replay.details is read (via fast_mpq) and only its player array is
+decoded; player names are never decoded, and neither sc2reader nor mpyq
+is imported.
+
+Batch mode (--batch) reads newline-delimited replay paths from stdin and
+prints "<path>\t<code>" per replay, using the same 0/1/2 codes, so the
+interpreter start-up cost is paid once for the whole list.
+
+With --emit-details a classified replay also gets one JSON line on stdout,
+{"details": <base64 replay.details>, "n_players": N, "team_sizes": [...]},
+which parse_details.py --stdin consumes without re-opening the archive.
+
+Batch verdicts are cached on disk (see classify_cache.py) keyed by path,
+size and mtime, so unchanged replays are not reopened; --no-cache bypasses
+it. A single replay is classified faster than the cache could be opened,
+so single-file mode never uses it.
 """
-import sys
+import argparse
+import base64
+import json
 import os
+import sys
 
-# Add the bundled sc2reader to the path if it exists
-script_dir = os.path.dirname(os.path.abspath(__file__))
-sc2reader_path = os.path.join(script_dir, "python_modules")
-if os.path.exists(sc2reader_path):
-    sys.path.insert(0, sc2reader_path)
+import fast_mpq
+from parse_details import classify as classify_details
+from parse_details import quick_is_1v1
 
-try:
-    import sc2reader
-except ImportError:
-    print("sc2reader not found. Please install: pip install sc2reader", file=sys.stderr)
-    sys.exit(2)
+# Below this many replays a process pool costs more to start than it saves
+BATCH_POOL_THRESHOLD = 16
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: check_replay_type.py <replay_file>", file=sys.stderr)
-        sys.exit(2)
+def read_details(replay_path):
+    """Raw replay.details for one replay"""
+    details_data = fast_mpq.fast_details_bytes(replay_path)
+    if details_data is None:
+        raise ValueError("replay.details not found in archive")
+    return details_data
+
+def details_payload(details_data, team_sizes):
+    """JSON line handed downstream by --emit-details"""
+    return json.dumps({
+        "details": base64.b64encode(details_data).decode("ascii"),
+        "n_players": sum(team_sizes),
+        "team_sizes": team_sizes,
+    })
+
+def batch_status(replay_path):
+    """Exit-code style status for one replay; errors are reported, not raised"""
+    try:
+        # Only the verdict is reported, so skip building team sizes
+        return 0 if quick_is_1v1(read_details(replay_path)) else 1
+    except Exception as e:
+        print(f"Error parsing {replay_path}: {type(e).__name__}: {e}", file=sys.stderr)
+        if os.environ.get("LL_DEBUG"):
+            import traceback
+            traceback.print_exc(file=sys.stderr)
+        return 2
 
-    replay_path = sys.argv[1]
+def open_cache():
+    """Open the batch cache, or return None (with a warning) if it is unusable"""
+    # The cache modules are only imported by --batch runs; single-file
+    # mode never touches the cache and should not pay for sqlite3
+    import sqlite3
+    import classify_cache
+    cache = classify_cache.ClassifyCache()
+    try:
+        return cache.open()
+    except (OSError, sqlite3.Error) as e:
+        cache.close()
+        print(f"Warning: classification cache unavailable: {e}", file=sys.stderr)
+        return None
 
+def save_cache(cache):
+    """Persist the cache; failing to write it never changes the verdict"""
+    import sqlite3
     try:
-        # Load replay with minimal parsing (load_level=1 for basic info only)
-        replay = sc2reader.load_replay(replay_path, load_level=1)
+        cache.save()
+        # Runs after every verdict has been printed
+        cache.sweep_deleted()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: could not write classification cache: {e}", file=sys.stderr)
+    finally:
+        cache.close()
 
-        # Check game type
-        game_type = getattr(replay, 'game_type', None)
-        player_count = len(replay.players)
+def run_batch(paths, workers, cache=None):
+    """Classify paths and print "<path>\t<code>" lines in input order"""
+    # Cached verdicts are printed without touching the replay; only the
+    # misses are handed to the (serial or pooled) classifier
+    if cache:
+        from classify_cache import file_key
+        keys = [file_key(path) for path in paths]
+        cached = [cache.get(key) for key in keys]
+    else:
+        keys = cached = [None] * len(paths)
+    misses = [path for path, status in zip(paths, cached) if status is None]
+
+    def emit(statuses):
+        for path, key, status in zip(paths, keys, cached):
+            if status is None:
+                status = next(statuses)
+                # Errors are not cached: the file may still be being written
+                if cache and status != 2:
+                    cache.put(key, status)
+            print(f"{path}\t{status}", flush=True)
+
+    if workers <= 1 or len(misses) < BATCH_POOL_THRESHOLD:
+        emit(batch_status(path) for path in misses)
+    else:
+        # Imported here: concurrent.futures pulls in multiprocessing, logging
+        # and socket, which single-file runs never need
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(misses) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            emit(iter(executor.map(batch_status, misses, chunksize=chunksize)))
+
+    if cache:
+        save_cache(cache)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check whether SC2 replays are 1v1 games.")
+    parser.add_argument("replay_file", nargs="?", help="replay to check (omit with --batch)")
+    parser.add_argument("--batch", action="store_true",
+                        help="read newline-delimited replay paths from stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for --batch (default: CPU count)")
+    parser.add_argument("--emit-details", action="store_true",
+                        help="print replay.details and team sizes as a JSON line on stdout")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="--batch: ignore and do not update the on-disk classification cache")
+    parser.add_argument("--debug", action="store_true",
+                        help="print full tracebacks on errors (same as LL_DEBUG=1)")
+    args = parser.parse_args()
+
+    if args.batch and args.emit_details:
+        parser.error("--emit-details only applies to a single replay")
+
+    # Set in the environment so batch pool workers inherit it
+    if args.debug:
+        os.environ["LL_DEBUG"] = "1"
+
+    if args.batch:
+        paths = [line.strip() for line in sys.stdin if line.strip()]
+        cache = None if args.no_cache else open_cache()
+        run_batch(paths, args.workers, cache)
+        sys.exit(0)
+
+    if args.replay_file is None:
+        parser.print_usage(sys.stderr)
+        sys.exit(2)
+
+    try:
+        details_data = read_details(args.replay_file)
+        # 1v1 means two single-player teams once observers are excluded
+        is_1v1, team_sizes = classify_details(details_data)
 
         # Print debug info
-        print(f"game_type={game_type}, players={player_count}", file=sys.stderr)
+        print(f"team_sizes={team_sizes}", file=sys.stderr)
 
-        # Exit code 0 if 1v1 (2 players), otherwise 1
-        # We can also check game_type if available
-        is_1v1 = player_count == 2
-        if game_type:
-            is_1v1 = is_1v1 and game_type in ('1v1', '1v1AI', 'AutoMM')
+        if args.emit_details:
+            print(details_payload(details_data, team_sizes))
 
         sys.exit(0 if is_1v1 else 1)
 
     except Exception as e:
-        print(f"Error parsing replay: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        print(f"Error parsing replay: {type(e).__name__}: {e}", file=sys.stderr)
+        # Formatting a traceback reads source lines for every frame; only
+        # pay for it when someone is actually debugging
+        if os.environ.get("LL_DEBUG"):
+            import traceback
+            traceback.print_exc(file=sys.stderr)
         sys.exit(2)
 
 if __name__ == "__main__":
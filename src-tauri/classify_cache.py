@@ -0,0 +1,202 @@
+"""
+On-disk cache of replay classification results for check_replay_type.py --batch.
+
+Entries are keyed by absolute path and validated against the file's size
+and mtime (ns), so a rescan of an unchanged folder costs one stat and one
+indexed lookup per replay instead of opening the archive. The cache is a
+SQLite database next to the uploader's own config files, so concurrent
+runs never clobber each other's writes.
+"""
+import os
+import sqlite3
+import sys
+import time
+
+APP_DIR_NAME = "ladder-legends-uploader"
+CACHE_FILE_NAME = "classify_cache.sqlite3"
+
+# Bump whenever the 1v1 rules change; a cache written by other rules is dropped
+CACHE_VERSION = 2
+
+# Bound on stored entries; once exceeded, least recently used ones are
+# dropped until EVICT_TO_PERCENT of it is left, so eviction is not re-run
+# on every save of a full cache
+MAX_ENTRIES = 50000
+EVICT_TO_PERCENT = 90
+
+# How often entries for deleted replays are swept out (one stat per entry)
+SWEEP_INTERVAL_NS = 24 * 60 * 60 * 10**9
+
+def config_dir():
+    """Same directory as get_config_dir() in config_utils.rs"""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~\\AppData\\Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, APP_DIR_NAME)
+
+def file_key(replay_path):
+    """Return (abspath, size, mtime_ns) for a replay, or None if it cannot be stat'ed"""
+    try:
+        st = os.stat(replay_path)
+    except OSError:
+        return None
+    return os.path.abspath(replay_path), st.st_size, st.st_mtime_ns
+
+class ClassifyCache:
+    """LRU map of abspath -> (size, mtime_ns, status), persisted in SQLite"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(config_dir(), CACHE_FILE_NAME)
+        self.conn = None
+        # Set when corruption only shows up on a lookup; save() then resets
+        self.corrupt = False
+        # Writes are queued and applied in one transaction by save()
+        self.hits = []
+        self.updates = []
+
+    def open(self):
+        """Open (creating or resetting if needed) the cache database"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            return self._setup()
+        except sqlite3.OperationalError:
+            # Locked or unreadable: not corruption, so leave the file alone
+            self.close()
+            raise
+        except sqlite3.DatabaseError:
+            return self._reset()
+
+    def _reset(self):
+        """Replace a corrupt database (not one, or malformed) with an empty cache"""
+        self.close()
+        for suffix in ("", "-journal"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+        self.corrupt = False
+        return self._setup()
+
+    def _setup(self):
+        """Connect and create or migrate the schema"""
+        # Autocommit mode: transactions below are begun explicitly
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS verdicts")
+                self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " status INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def get(self, key):
+        """Cached status for a file_key(), or None on a miss or stale entry"""
+        if key is None:
+            return None
+        path, size, mtime_ns = key
+        try:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, status FROM verdicts WHERE path = ?", (path,)).fetchone()
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.DatabaseError:
+            self.corrupt = True
+            return None
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        self.hits.append(path)
+        return row[2]
+
+    def put(self, key, status):
+        """Record a status for a file_key() (taken before the file was read)"""
+        if key is not None:
+            self.updates.append(key + (status,))
+
+    def _evict(self):
+        """Drop the least recently used entries once the cache is over MAX_ENTRIES"""
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        if count <= MAX_ENTRIES:
+            return
+        self.conn.execute(
+            "DELETE FROM verdicts WHERE path IN"
+            " (SELECT path FROM verdicts ORDER BY last_used LIMIT ?)",
+            (count - MAX_ENTRIES * EVICT_TO_PERCENT // 100,))
+
+    def save(self):
+        """Apply queued hits and new verdicts in a single transaction"""
+        if self.corrupt:
+            self._reset()
+            self.hits.clear()
+        if not (self.hits or self.updates):
+            return
+        try:
+            self._write()
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.DatabaseError:
+            # Corruption found while writing: keep this run's verdicts only
+            self._reset()
+            self.hits.clear()
+            self._write()
+        self.hits.clear()
+        self.updates.clear()
+
+    def _write(self):
+        now = time.time_ns()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "UPDATE verdicts SET last_used = ? WHERE path = ?",
+                ((now, path) for path in self.hits))
+            self.conn.executemany(
+                "INSERT INTO verdicts (path, size, mtime_ns, status, last_used)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET"
+                " size = excluded.size, mtime_ns = excluded.mtime_ns,"
+                " status = excluded.status, last_used = excluded.last_used",
+                (entry + (now,) for entry in self.updates))
+            if self.updates:
+                self._evict()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+
+    def sweep_deleted(self):
+        """Drop entries for replays that no longer exist, at most once per SWEEP_INTERVAL_NS"""
+        now = time.time_ns()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_sweep'").fetchone()
+        if row is not None and now - row[0] < SWEEP_INTERVAL_NS:
+            return
+        # Stat outside any transaction so concurrent runs are not blocked;
+        # only the deletes take the write lock
+        paths = [path for (path,) in self.conn.execute("SELECT path FROM verdicts")]
+        gone = [(path,) for path in paths if not os.path.exists(path)]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("DELETE FROM verdicts WHERE path = ?", gone)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sweep', ?)", (now,))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
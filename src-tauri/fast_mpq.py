@@ -0,0 +1,213 @@
+"""
+Minimal zero-copy MPQ reader for the few small files we pull out of an
+SC2Replay (replay.details, replay.initData).
+
+mpyq reads the listfile, builds namedtuples for every table entry and
+returns a fresh bytes object per read. Here the archive is mmapped, only
+the hash/block tables are decrypted, and only the requested files are
+touched: stored files come back as memoryview slices of the mapping and
+compressed ones are inflated into a single preallocated bytearray.
+"""
+import array
+import bz2
+import functools
+import mmap
+import struct
+import zlib
+
+MPQ_FILE_COMPRESS = 0x00000200
+MPQ_FILE_ENCRYPTED = 0x00010000
+MPQ_FILE_SINGLE_UNIT = 0x01000000
+MPQ_FILE_SECTOR_CRC = 0x04000000
+MPQ_FILE_EXISTS = 0x80000000
+
+# Hash types for hash_string (offsets into the crypt table)
+HASH_TABLE_OFFSET = 0
+HASH_A = 1
+HASH_B = 2
+HASH_TABLE = 3
+
+DEFAULT_NAMES = ("replay.details", "replay.initData")
+
+# Precompiled layouts: user data header (magic, user_data_size,
+# mpq_header_offset, user_data_header_size) and the MPQ header itself
+_USER_DATA_HEADER = struct.Struct("<4s3I")
+_MPQ_HEADER = struct.Struct("<4s2I2H4I")
+
+def _build_crypt_table():
+    """Build the 1280-entry table used by the MPQ hash and cipher"""
+    seed = 0x00100001
+    table = array.array("I", [0]) * 0x500
+    for i in range(256):
+        index = i
+        for _ in range(5):
+            seed = (seed * 125 + 3) % 0x2AAAAB
+            temp1 = (seed & 0xFFFF) << 0x10
+            seed = (seed * 125 + 3) % 0x2AAAAB
+            temp2 = seed & 0xFFFF
+            table[index] = temp1 | temp2
+            index += 0x100
+    return table
+
+_CRYPT_TABLE = _build_crypt_table()
+
+def hash_string(name, hash_type):
+    """Hash a file or table name using Blizzard's MPQ string hash"""
+    seed1 = 0x7FED7FED
+    seed2 = 0xEEEEEEEE
+    for ch in name.upper().encode("ascii"):
+        value = _CRYPT_TABLE[(hash_type << 8) + ch]
+        seed1 = (value ^ (seed1 + seed2)) & 0xFFFFFFFF
+        seed2 = (ch + seed1 + seed2 + (seed2 << 5) + 3) & 0xFFFFFFFF
+    return seed1
+
+@functools.lru_cache(maxsize=None)
+def _name_hash(name):
+    """(hash_a, hash_b) identifying a file name in the hash table"""
+    return hash_string(name, HASH_A), hash_string(name, HASH_B)
+
+@functools.lru_cache(maxsize=None)
+def _table_struct(entries):
+    """Struct unpacking a table of 16-byte entries as flat uint32 words"""
+    return struct.Struct("<%dI" % (entries * 4))
+
+# Hashes that would otherwise be recomputed for every archive opened
+_HASH_TABLE_KEY = hash_string("(hash table)", HASH_TABLE)
+_BLOCK_TABLE_KEY = hash_string("(block table)", HASH_TABLE)
+for _name in DEFAULT_NAMES:
+    _name_hash(_name)
+
+def _decrypt_table(buf, offset, entries, key):
+    """Decrypt a hash or block table into a flat list of uint32 words"""
+    words = _table_struct(entries).unpack_from(buf, offset)
+    out = [0] * len(words)
+    seed1 = key
+    seed2 = 0xEEEEEEEE
+    for i, word in enumerate(words):
+        seed2 = (seed2 + _CRYPT_TABLE[0x400 + (seed1 & 0xFF)]) & 0xFFFFFFFF
+        value = (word ^ (seed1 + seed2)) & 0xFFFFFFFF
+        seed1 = (((~seed1 << 0x15) + 0x11111111) | (seed1 >> 0x0B)) & 0xFFFFFFFF
+        seed2 = (value + seed2 + (seed2 << 5) + 3) & 0xFFFFFFFF
+        out[i] = value
+    return out
+
+def _decompress(data):
+    """Decompress one sector/unit according to its leading compression byte"""
+    compression_type = data[0]
+    if compression_type == 2:
+        return zlib.decompress(data[1:], 15)
+    elif compression_type == 16:
+        return bz2.decompress(data[1:])
+    raise RuntimeError(f"Unsupported compression type: {compression_type}")
+
+def _read_file(buf, archive_offset, sector_size, block):
+    """Return the contents of one block as a memoryview (None if empty)"""
+    block_offset, archived_size, size, flags = block
+    if not flags & MPQ_FILE_EXISTS or archived_size == 0:
+        return None
+    if flags & MPQ_FILE_ENCRYPTED:
+        raise NotImplementedError("Encrypted MPQ files are not supported")
+
+    start = archive_offset + block_offset
+    data = buf[start:start + archived_size]
+
+    if flags & MPQ_FILE_SINGLE_UNIT:
+        # Compression only happens when at least one byte is gained
+        if flags & MPQ_FILE_COMPRESS and size > archived_size:
+            return memoryview(_decompress(data))
+        return data
+
+    if not flags & MPQ_FILE_COMPRESS:
+        # Uncompressed multi-sector files are stored contiguously
+        return data
+
+    # Compressed multi-sector file: a table of sector offsets precedes the
+    # sectors (plus one extra entry when sector CRCs are present)
+    sectors = size // sector_size + 1
+    crc = bool(flags & MPQ_FILE_SECTOR_CRC)
+    if crc:
+        sectors += 1
+    positions = struct.unpack_from("<%dI" % (sectors + 1), data)
+
+    out = bytearray(size)
+    written = 0
+    for i in range(len(positions) - (2 if crc else 1)):
+        sector = data[positions[i]:positions[i + 1]]
+        if size - written > len(sector):
+            sector = _decompress(sector)
+        out[written:written + len(sector)] = sector
+        written += len(sector)
+    return memoryview(out)[:written]
+
+def _map_archive(path):
+    """
+    mmap an archive and parse its MPQ header.
+    Returns (buf, archive_offset, sector_size, hash_table_offset,
+    block_table_offset, hash_table_entries, block_table_entries).
+    """
+    with open(path, "rb") as f:
+        # The mapping outlives the file object and is released once the
+        # last memoryview into it is gone
+        buf = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, _, archive_offset, _ = _USER_DATA_HEADER.unpack_from(buf, 0)
+    if magic == b"MPQ\x1a":
+        archive_offset = 0
+    elif magic != b"MPQ\x1b":
+        raise ValueError("Invalid MPQ file header")
+
+    (_, _, _, _, sector_size_shift, hash_table_offset, block_table_offset,
+     hash_table_entries, block_table_entries) = _MPQ_HEADER.unpack_from(buf, archive_offset)
+    return (buf, archive_offset, 512 << sector_size_shift,
+            archive_offset + hash_table_offset, archive_offset + block_table_offset,
+            hash_table_entries, block_table_entries)
+
+def _block_indices(buf, hash_table_offset, hash_table_entries):
+    """Map (hash_a, hash_b) to block index for every hash table entry"""
+    hash_table = _decrypt_table(buf, hash_table_offset, hash_table_entries, _HASH_TABLE_KEY)
+    # Hash entries are (hash_a, hash_b, locale|platform, block_index);
+    # the first entry for a name wins, as in mpyq
+    blocks = {}
+    for i in range(0, len(hash_table), 4):
+        blocks.setdefault((hash_table[i], hash_table[i + 1]), hash_table[i + 3])
+    return blocks
+
+def read_files(path, names=DEFAULT_NAMES):
+    """
+    Read the named files from an MPQ archive.
+    Returns {name: memoryview}; names missing from the archive map to None.
+    """
+    (buf, archive_offset, sector_size, hash_table_offset, block_table_offset,
+     hash_table_entries, block_table_entries) = _map_archive(path)
+
+    blocks = _block_indices(buf, hash_table_offset, hash_table_entries)
+    block_table = _decrypt_table(buf, block_table_offset, block_table_entries, _BLOCK_TABLE_KEY)
+
+    result = {}
+    for name in names:
+        block_index = blocks.get(_name_hash(name))
+        if block_index is None or block_index >= block_table_entries:
+            result[name] = None
+            continue
+        block = block_table[block_index * 4:block_index * 4 + 4]
+        result[name] = _read_file(buf, archive_offset, sector_size, block)
+    return result
+
+def fast_details_bytes(path):
+    """
+    Read replay.details alone, for the 1v1 check.
+    SC2 usually stores this small file uncompressed, in which case the
+    result is a memoryview straight into the mapping. Only the block table
+    prefix up to its entry is decrypted (the cipher is chained, so entries
+    after it are never needed).
+    """
+    (buf, archive_offset, sector_size, hash_table_offset, block_table_offset,
+     hash_table_entries, block_table_entries) = _map_archive(path)
+
+    blocks = _block_indices(buf, hash_table_offset, hash_table_entries)
+    block_index = blocks.get(_name_hash("replay.details"))
+    if block_index is None or block_index >= block_table_entries:
+        return None
+
+    block = _decrypt_table(buf, block_table_offset, block_index + 1, _BLOCK_TABLE_KEY)[-4:]
+    return _read_file(buf, archive_offset, sector_size, block)
@@ -2,10 +2,24 @@
 """
 Inspect SC2 replay files to understand their structure.
 This helps us write a minimal Rust parser.
+
+Several replays are inspected in parallel worker processes; each report
+is buffered and printed whole, in argument order.
 """
+import io
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+
+import mpyq
 import sc2reader
 
+from parse_details import dump, read_players
+
+# sc2reader is pure Python, so fewer replays than this are not worth a pool
+POOL_THRESHOLD = 4
+
 def inspect_replay(replay_path):
     print(f"\n{'='*60}")
     print(f"Inspecting: {replay_path}")
@@ -31,18 +45,19 @@ def inspect_replay(replay_path):
     print("MPQ Archive Contents:")
     print(f"{'='*60}\n")
 
-    import mpyq
-    archive = mpyq.MPQArchive(replay_path)
+    # Reuse the archive sc2reader already opened instead of opening and
+    # parsing the MPQ again for the raw dumps below
+    archive = replay.archive
 
-    for filename in archive.files:
-        try:
-            file_data = archive.read_file(filename)
-            if file_data:
-                print(f"{filename}: {len(file_data)} bytes")
-            else:
-                print(f"{filename}: (empty or null)")
-        except:
-            print(f"{filename}: (could not read)")
+    # Sizes come straight from the block table; only the listfile and the
+    # two blobs analyzed below are ever decompressed
+    for filename in archive.read_file("(listfile)").decode().splitlines():
+        entry = archive.get_hash_table_entry(filename)
+        block = archive.block_table[entry.block_table_index] if entry else None
+        if block and block.flags & mpyq.MPQ_FILE_EXISTS and block.archived_size:
+            print(f"{filename}: {block.size} bytes (compressed {block.archived_size})")
+        else:
+            print(f"{filename}: (empty or null)")
 
     # Let's examine replay.initData specifically
     print(f"\n{'='*60}")
@@ -62,6 +77,8 @@ def inspect_replay(replay_path):
     details = archive.read_file("replay.details")
     print(f"Size: {len(details)} bytes")
     print(f"First 100 bytes (hex): {details[:100].hex()}")
+    print()
+    dump(read_players(details))
 
     # Search for player count in initData
     print(f"\n{'='*60}")
@@ -74,21 +91,44 @@ def inspect_replay(replay_path):
     print(f"Expected player count: {player_count}")
 
     # Look for the byte value matching player count in first 200 bytes
-    for i in range(min(200, len(init_data))):
-        if init_data[i] == player_count:
-            context_start = max(0, i - 10)
-            context_end = min(len(init_data), i + 10)
-            print(f"Found {player_count} at offset {i}: {init_data[context_start:context_end].hex()}")
+    # (bytes.find is a memchr scan rather than a Python-level loop)
+    head = init_data[:200]
+    needle = bytes([player_count])
+    i = head.find(needle)
+    while i >= 0:
+        context_start = max(0, i - 10)
+        context_end = min(len(init_data), i + 10)
+        print(f"Found {player_count} at offset {i}: {init_data[context_start:context_end].hex()}")
+        i = head.find(needle, i + 1)
+
+def _inspect_one(replay_path):
+    """Inspect one replay, reporting any error; output goes to sys.stdout/stderr"""
+    try:
+        inspect_replay(replay_path)
+    except Exception as e:
+        print(f"Error inspecting {replay_path}: {e}")
+        traceback.print_exc()
+
+def _inspect_captured(replay_path):
+    """Run _inspect_one in a worker and return its (stdout, stderr) text"""
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        _inspect_one(replay_path)
+    return out.getvalue(), err.getvalue()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: inspect_replay.py <replay1.SC2Replay> [replay2.SC2Replay ...]")
         sys.exit(1)
 
-    for replay_path in sys.argv[1:]:
-        try:
-            inspect_replay(replay_path)
-        except Exception as e:
-            print(f"Error inspecting {replay_path}: {e}")
-            import traceback
-            traceback.print_exc()
+    paths = sys.argv[1:]
+    if len(paths) < POOL_THRESHOLD:
+        for replay_path in paths:
+            _inspect_one(replay_path)
+    else:
+        # One replay per task: each one is far heavier than the dispatch
+        with ProcessPoolExecutor() as executor:
+            for out, err in executor.map(_inspect_captured, paths):
+                sys.stdout.write(out)
+                sys.stderr.write(err)
+                sys.stdout.flush()
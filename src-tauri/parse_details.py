@@ -2,42 +2,110 @@
 """
 Parse replay.details to extract player count and team information.
 Based on sc2reader's DetailsReader.
+
+Pass --stdin instead of a replay path to read the payload printed by
+check_replay_type.py --emit-details, skipping the archive open entirely:
+
+    check_replay_type.py --emit-details x.SC2Replay | parse_details.py --stdin
 """
+import base64
+import json
+import os
 import sys
-import mpyq
+from collections import Counter
 
-# Import sc2reader for the BitPackedDecoder
-try:
-    from sc2reader.decoders import BitPackedDecoder
-except ImportError:
-    print("Error: sc2reader not installed. Run: pip install sc2reader", file=sys.stderr)
-    sys.exit(2)
+import fast_mpq
+from parse_initdata import BitPackedDecoder
 
-def parse_details(replay_path):
-    """Parse replay.details to extract player and team info"""
-    archive = mpyq.MPQArchive(replay_path)
-    details_data = archive.read_file("replay.details")
-
-    # Use sc2reader's BitPackedDecoder with read_struct()
+def _player_array_decoder(details_data):
+    """Return a decoder positioned at details[0] (the player array)"""
     decoder = BitPackedDecoder(details_data)
-    details = decoder.read_struct()
 
-    # details is a list where:
-    # details[0] = array of players
-    # details[1] = map name
-    # etc.
+    # details is a struct (type 0x05) whose first field (key 0) is the
+    # player array; nothing after that field is ever decoded
+    if decoder.read_uint8() != 0x05:
+        raise ValueError("replay.details is not a struct")
+    decoder.read_vint()  # field count
+    if decoder.read_vint() != 0:
+        raise ValueError("replay.details does not start with the player array")
+    return decoder
+
+def read_players(details_data):
+    """Decode only details[0] (the player array), skipping map name and the rest"""
+    # details[0] is optional; an absent array means no players
+    return _player_array_decoder(details_data).read_struct() or []
 
-    players = details[0]
+def classify_players(players):
+    """
+    Decide 1v1 from a decoded player array without decoding player names.
+    Returns (is_1v1, team_sizes) with team_sizes sorted ascending.
+    """
+    # p[5] = team (vint), p[7] = observe (vint) - 0 for participants,
+    # 1 for spectators, 2 for referees
+    teams = Counter(p[5] for p in players if p[7] == 0)
+    team_sizes = sorted(teams.values())
+    return team_sizes == [1, 1], team_sizes
+
+def classify(details_data):
+    """classify_players() straight from raw replay.details bytes"""
+    return classify_players(read_players(details_data))
+
+def quick_is_1v1(details_data):
+    """
+    Yes/no 1v1 check for batch mode: player entries are decoded and tallied
+    one at a time, without building the player list or team Counter. Once
+    a third participant or a second player on one team rules out 1v1, the
+    remaining entries are still read so that a truncated or malformed array
+    fails exactly as classify() does.
+    """
+    decoder = _player_array_decoder(details_data)
+    datatype = decoder.read_uint8()
+    # Nesting depth of the entries, as read_struct would count it
+    depth = 1
+    if datatype == 0x04:  # optional wrapper around the array
+        if decoder.read_uint8() == 0:
+            return False
+        datatype = decoder.read_uint8()
+        depth = 2
+    if datatype != 0x00:
+        raise ValueError("replay.details player list is not an array")
+    count = decoder.read_vint()
+    if count < 0:
+        raise ValueError(f"Negative array length: {count}")
+
+    teams = set()
+    ruled_out = False
+    for _ in range(count):
+        p = decoder.read_struct(depth)
+        # p[5] = team (vint), p[7] = observe (vint) - 0 for participants
+        team, observe = p[5], p[7]
+        if observe == 0 and not ruled_out:
+            if len(teams) == 2 or team in teams:
+                ruled_out = True
+            else:
+                teams.add(team)
+    return not ruled_out and len(teams) == 2
+
+def derive_game_type(team_sizes):
+    """Label a game from its non-observer team sizes (e.g. "1v1", "2v2", "FFA")"""
+    if len(team_sizes) == 0:
+        return "0v0 (no players)"
+    elif len(team_sizes) > 2 and sum(team_sizes) == len(team_sizes):
+        return "FFA"
+    return "v".join(str(size) for size in sorted(team_sizes))
+
+def dump(players):
+    """Print each player, the non-observer teams and the derived game type"""
     print(f"Total players: {len(players)}")
 
-    # Count players per team
-    # Each player is a dict/array where index 5 is the team ID
+    # Group non-observer player names by team
     teams = {}
     for p in players:
         # p[0] = name (blob)
         # p[5] = team (vint)
         # p[7] = observe (vint) - 0 for participants, 1+ for observers
-        name = p[0].decode('utf-8', errors='replace')
+        # The positional error handler skips keyword parsing
+        name = p[0].decode('utf-8', 'replace')
         team = p[5]
         observe = p[7]
 
@@ -45,41 +113,48 @@ def parse_details(replay_path):
 
         # Only count non-observers as players
         if observe == 0:
-            if team not in teams:
-                teams[team] = []
-            teams[team].append(name)
+            teams.setdefault(team, []).append(name)
 
     print(f"\nNon-observer teams:")
     for team_id, team_players in sorted(teams.items()):
         print(f"  Team {team_id}: {len(team_players)} players - {', '.join(team_players)}")
 
-    # Calculate game type
-    team_sizes = [len(players) for players in teams.values()]
-    if len(team_sizes) == 0:
-        game_type = "0v0 (no players)"
-    elif len(team_sizes) > 2 and sum(team_sizes) == len(team_sizes):
-        game_type = "FFA"
-    else:
-        game_type = "v".join(str(size) for size in sorted(team_sizes))
-
+    game_type = derive_game_type([len(names) for names in teams.values()])
     print(f"\nDerived game type: {game_type}")
 
-    is_1v1 = game_type == "1v1"
+def report(details_data):
+    """Print player and team info for raw replay.details bytes and return whether it is 1v1"""
+    players = read_players(details_data)
+    dump(players)
+
+    is_1v1, _ = classify_players(players)
     print(f"Is 1v1: {is_1v1}")
 
     return is_1v1
 
+def parse_details(replay_path):
+    """Parse replay.details, print player and team info, and return whether it is 1v1"""
+    return report(fast_mpq.read_files(replay_path, ("replay.details",))["replay.details"])
+
+def parse_details_payload(stream):
+    """Pipeline mode: report on the JSON line from check_replay_type.py --emit-details"""
+    payload = json.loads(stream.readline())
+    return report(base64.b64decode(payload["details"]))
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
-        print("Usage: parse_details.py <replay_file>")
+        print("Usage: parse_details.py <replay_file | --stdin>")
         sys.exit(1)
 
-    replay_path = sys.argv[1]
     try:
-        is_1v1 = parse_details(replay_path)
+        if sys.argv[1] == "--stdin":
+            is_1v1 = parse_details_payload(sys.stdin)
+        else:
+            is_1v1 = parse_details(sys.argv[1])
         sys.exit(0 if is_1v1 else 1)
     except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        if os.environ.get("LL_DEBUG"):
+            import traceback
+            traceback.print_exc(file=sys.stderr)
         sys.exit(2)
@@ -3,82 +3,198 @@
 Parse replay.initData to extract player count.
 This is a simplified version based on sc2reader's InitDataReader.
 """
+import os
+import struct
 import sys
-import mpyq
 
-class BitPackedDecoder:
-    """Minimal bitpacked decoder for SC2 replay data"""
+import fast_mpq
+
+# Deepest read_struct nesting accepted; real replay.details stays under 10,
+# and a malformed file must fail cleanly instead of exhausting the stack
+MAX_STRUCT_DEPTH = 64
+
+# Big-endian unpackers for the whole-byte runs read_bits sees most often
+_WHOLE_BYTES = {n: struct.Struct(fmt) for n, fmt in ((2, '>H'), (4, '>I'), (8, '>Q'))}
+
+class PyBitPackedDecoder:
+    """Minimal bitpacked decoder for SC2 replay data (pure-Python fallback)"""
     def __init__(self, data):
-        self.data = data
+        # A memoryview makes every slice below zero-copy, whether data is
+        # bytes (--stdin payloads) or already a view into the archive mmap
+        self.data = memoryview(data)
         self.pos = 0
-        self.bit_shift = 0
-        self.next_byte = None
+        # Unconsumed high bits of the current byte, right-aligned
+        self.acc = 0
+        self.nbits = 0
 
     def read_bits(self, count):
         """Read count bits from the bitpacked data"""
-        result = 0
-        bits_remaining = count
-
-        # If we have a byte in progress, use it first
-        if self.bit_shift != 0:
-            bits_available = 8 - self.bit_shift
-
-            if bits_available < bits_remaining:
-                bits_remaining -= bits_available
-                result = (self.next_byte >> self.bit_shift) << bits_remaining
-            elif bits_available > bits_remaining:
-                self.bit_shift += bits_remaining
-                return (self.next_byte >> self.bit_shift - bits_remaining) & ((1 << bits_remaining) - 1)
+        if count < 0:
+            raise ValueError(f"Negative bit count: {count}")
+        # Bits come off the low end of each byte, but a value spanning bytes
+        # is assembled high chunk first: pending bits, whole bytes, then the
+        # low bits of one more byte
+        if count <= self.nbits:
+            self.nbits -= count
+            result = self.acc & ((1 << count) - 1)
+            self.acc >>= count
+            return result
+
+        data = self.data
+        pos = self.pos
+        result = self.acc
+        need = count - self.nbits
+        # One bounds check for every byte consumed below, so truncated data
+        # raises EOFError on every path, as in the compiled decoder
+        if pos + ((need + 7) >> 3) > len(data):
+            raise EOFError("Unexpected end of bitpacked data")
+
+        # Runs of 2+ whole bytes come out of one C-level unpack instead of
+        # one index + shift per byte
+        if need >= 16:
+            nbytes = need >> 3
+            unpacker = _WHOLE_BYTES.get(nbytes)
+            if unpacker is not None:
+                chunk = unpacker.unpack_from(data, pos)[0]
             else:
-                self.bit_shift = 0
-                return self.next_byte >> self.bit_shift
-
-        # Read whole bytes
-        while bits_remaining >= 8:
-            if self.pos >= len(self.data):
-                return result
-            byte = self.data[self.pos]
-            self.pos += 1
-            bits_remaining -= 8
-            result = result | (byte << bits_remaining)
-
-        # Read remaining bits
-        if bits_remaining > 0:
-            if self.pos >= len(self.data):
-                return result
-            self.next_byte = self.data[self.pos]
-            self.pos += 1
-            self.bit_shift = bits_remaining
-            result = result | (self.next_byte & ((1 << bits_remaining) - 1))
-
+                chunk = int.from_bytes(data[pos:pos + nbytes], 'big')
+            result = (result << (nbytes << 3)) | chunk
+            pos += nbytes
+            need &= 7
+        elif need >= 8:
+            result = (result << 8) | data[pos]
+            pos += 1
+            need -= 8
+
+        if need:
+            byte = data[pos]
+            pos += 1
+            result = (result << need) | (byte & ((1 << need) - 1))
+            self.acc = byte >> need
+            self.nbits = 8 - need
+        else:
+            self.acc = 0
+            self.nbits = 0
+        self.pos = pos
         return result
 
     def read_uint8(self):
         """Read 8 bits as unsigned integer"""
+        if self.nbits == 0:
+            # Byte-aligned (the common case in read_struct): the next byte is the value
+            try:
+                byte = self.data[self.pos]
+            except IndexError:
+                raise EOFError("Unexpected end of bitpacked data") from None
+            self.pos += 1
+            return byte
         return self.read_bits(8)
 
     def read_bool(self):
         """Read 1 bit as boolean"""
-        return self.read_bits(1) != 0
+        if self.nbits == 0:
+            try:
+                self.acc = self.data[self.pos]
+            except IndexError:
+                raise EOFError("Unexpected end of bitpacked data") from None
+            self.pos += 1
+            self.nbits = 8
+        self.nbits -= 1
+        bit = self.acc & 1
+        self.acc >>= 1
+        return bit != 0
 
     def byte_align(self):
         """Move to the next byte boundary"""
-        self.bit_shift = 0
-        self.next_byte = None
+        self.acc = 0
+        self.nbits = 0
 
     def read_aligned_string(self, length):
         """Read a byte-aligned string of given length"""
+        if length < 0:
+            raise ValueError(f"Negative string length: {length}")
         self.byte_align()
         if self.pos + length > len(self.data):
             return ""
-        s = self.data[self.pos:self.pos + length].decode('utf-8', errors='replace')
+        # Decoded straight from the view, with no intermediate bytes
+        s = str(self.data[self.pos:self.pos + length], 'utf-8', 'replace')
         self.pos += length
         return s
 
+    def read_aligned_bytes(self, length):
+        """Read a byte-aligned blob of given length"""
+        if length < 0:
+            raise ValueError(f"Negative blob length: {length}")
+        self.byte_align()
+        # The one copy: blobs outlive the decoder and must not pin the mmap
+        b = bytes(self.data[self.pos:self.pos + length])
+        self.pos += length
+        return b
+
+    def read_vint(self):
+        """Read a signed variable-length integer (low bit of first byte is the sign)"""
+        byte = self.read_uint8()
+        negative = byte & 0x01
+        result = (byte & 0x7F) >> 1
+        bits = 6
+        while byte & 0x80:
+            byte = self.read_uint8()
+            result |= (byte & 0x7F) << bits
+            bits += 7
+        return -result if negative else result
+
+    def read_struct(self, depth=0):
+        """Read a nested versioned structure (same layout as sc2reader's read_struct)"""
+        if depth > MAX_STRUCT_DEPTH:
+            raise ValueError(f"Structure nested deeper than {MAX_STRUCT_DEPTH} levels")
+        self.byte_align()
+        datatype = self.read_uint8()
+
+        if datatype == 0x00:  # array
+            count = self.read_vint()
+            if count < 0:
+                raise ValueError(f"Negative array length: {count}")
+            return [self.read_struct(depth + 1) for _ in range(count)]
+        elif datatype == 0x01:  # bitarray
+            return self.read_bits(self.read_vint())
+        elif datatype == 0x02:  # blob
+            return self.read_aligned_bytes(self.read_vint())
+        elif datatype == 0x03:  # choice
+            self.read_vint()
+            return self.read_struct(depth + 1)
+        elif datatype == 0x04:  # optional
+            return self.read_struct(depth + 1) if self.read_uint8() != 0 else None
+        elif datatype == 0x05:  # struct
+            entries = self.read_vint()
+            if entries < 0:
+                raise ValueError(f"Negative struct field count: {entries}")
+            return {self.read_vint(): self.read_struct(depth + 1) for _ in range(entries)}
+        elif datatype == 0x06:  # u8
+            return self.read_uint8()
+        elif datatype == 0x07:  # u32
+            return self.read_aligned_bytes(4)
+        elif datatype == 0x08:  # u64
+            return int.from_bytes(self.read_aligned_bytes(8), 'big')
+        elif datatype == 0x09:  # vint
+            return self.read_vint()
+
+        raise TypeError(f"Unknown data structure: {datatype}")
+
+# Prefer the compiled decoder from python_modules/bitdecoder.pyx when it
+# has been built (see python_modules/setup.py)
+_modules_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_modules")
+if os.path.isdir(_modules_dir) and _modules_dir not in sys.path:
+    sys.path.append(_modules_dir)
+
+try:
+    from bitdecoder import BitPackedDecoder
+except ImportError:
+    BitPackedDecoder = PyBitPackedDecoder
+
 def parse_initdata(replay_path):
     """Parse replay.initData to extract player count and game info"""
-    archive = mpyq.MPQArchive(replay_path)
-    init_data = archive.read_file("replay.initData")
+    files = fast_mpq.read_files(replay_path, ("replay.initData", "replay.details"))
+    init_data = files["replay.initData"]
 
     decoder = BitPackedDecoder(init_data)
 
@@ -93,7 +209,7 @@ def parse_initdata(replay_path):
     # For simplicity, let's parse replay.details instead which has simpler format
 
     # Try replay.details which has player information
-    details = archive.read_file("replay.details")
+    details = files["replay.details"]
     print(f"\nreplay.details size: {len(details)} bytes")
 
     # replay.details is also bitpacked but has a simpler structure
@@ -0,0 +1,192 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled drop-in for parse_initdata.PyBitPackedDecoder.
+
+SC2 bitpacked data is consumed from the low bits of each byte upwards,
+while multi-chunk values are assembled high part first. Pending bits of
+a partially consumed byte live right-aligned in ``acc``; whole bytes are
+shifted straight into a C uint64 so a typical read is a handful of
+shifts instead of several Python attribute loads per byte.
+"""
+cimport cython
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+from libc.stdint cimport uint64_t
+
+# Same limit as parse_initdata.MAX_STRUCT_DEPTH: read_struct recurses on the
+# C stack, so unbounded nesting in a malformed file would crash the process
+MAX_STRUCT_DEPTH = 64
+
+# final: calls between the cpdef methods below bind directly in C
+# without checking for Python-level overrides
+@cython.final
+cdef class BitPackedDecoder:
+    cdef const unsigned char[:] view
+    cdef const unsigned char* buf
+    cdef Py_ssize_t n
+    cdef public Py_ssize_t pos
+    cdef uint64_t acc
+    cdef int nbits
+
+    def __cinit__(self, data):
+        self.view = data
+        self.n = self.view.shape[0]
+        self.buf = &self.view[0] if self.n else NULL
+        self.pos = 0
+        self.acc = 0
+        self.nbits = 0
+
+    cdef inline uint64_t _next_byte(self) except? 0xFFFFFFFFFFFFFFFF:
+        if self.pos >= self.n:
+            raise EOFError("Unexpected end of bitpacked data")
+        self.pos += 1
+        return self.buf[self.pos - 1]
+
+    cpdef object read_bits(self, int count):
+        """Read count bits from the bitpacked data"""
+        cdef uint64_t result, b
+        cdef int need
+
+        if count < 0:
+            raise ValueError(f"Negative bit count: {count}")
+        if count <= self.nbits:
+            result = self.acc & ((1 << count) - 1)
+            self.acc >>= count
+            self.nbits -= count
+            return result
+
+        # Values wider than the accumulator go through Python ints
+        if count > 56:
+            return self._read_bits_wide(count)
+
+        result = self.acc
+        need = count - self.nbits
+        while need >= 8:
+            result = (result << 8) | self._next_byte()
+            need -= 8
+
+        if need:
+            b = self._next_byte()
+            result = (result << need) | (b & ((1 << need) - 1))
+            self.acc = b >> need
+            self.nbits = 8 - need
+        else:
+            self.acc = 0
+            self.nbits = 0
+        return result
+
+    cdef object _read_bits_wide(self, int count):
+        # Same chunking as read_bits (pending bits, whole bytes, then the low
+        # bits of one more byte); splitting into two narrower reads would
+        # not be equivalent because chunks follow byte boundaries
+        cdef uint64_t b
+        cdef int need = count - self.nbits
+        cdef object result = self.acc
+        while need >= 8:
+            result = (result << 8) | self._next_byte()
+            need -= 8
+
+        if need:
+            b = self._next_byte()
+            result = (result << need) | (b & ((1 << need) - 1))
+            self.acc = b >> need
+            self.nbits = 8 - need
+        else:
+            self.acc = 0
+            self.nbits = 0
+        return result
+
+    cpdef int read_uint8(self) except -1:
+        """Read 8 bits as unsigned integer"""
+        if self.nbits == 0:
+            # Byte-aligned (the common case in read_struct): the next byte is the value
+            return <int>self._next_byte()
+        return self.read_bits(8)
+
+    cpdef bint read_bool(self) except -1:
+        """Read 1 bit as boolean"""
+        cdef bint bit
+        if self.nbits == 0:
+            self.acc = self._next_byte()
+            self.nbits = 8
+        bit = self.acc & 1
+        self.acc >>= 1
+        self.nbits -= 1
+        return bit
+
+    cpdef void byte_align(self):
+        """Move to the next byte boundary"""
+        self.acc = 0
+        self.nbits = 0
+
+    cpdef bytes read_aligned_bytes(self, Py_ssize_t length):
+        """Read a byte-aligned blob of given length"""
+        if length < 0:
+            raise ValueError(f"Negative blob length: {length}")
+        self.byte_align()
+        cdef Py_ssize_t start = self.pos
+        if length > self.n - start:
+            length = self.n - start
+        self.pos = start + length
+        return self.buf[start:start + length]
+
+    def read_aligned_string(self, Py_ssize_t length):
+        """Read a byte-aligned string of given length"""
+        if length < 0:
+            raise ValueError(f"Negative string length: {length}")
+        self.byte_align()
+        if self.pos + length > self.n:
+            return ""
+        # Decoded straight from the buffer, with no intermediate bytes
+        cdef Py_ssize_t start = self.pos
+        self.pos = start + length
+        return PyUnicode_DecodeUTF8(<const char*>self.buf + start, length, "replace")
+
+    cpdef object read_vint(self):
+        """Read a signed variable-length integer (low bit of first byte is the sign)"""
+        cdef int byte = self.read_uint8()
+        cdef int negative = byte & 0x01
+        cdef int bits = 6
+        cdef object result = (byte & 0x7F) >> 1
+        while byte & 0x80:
+            byte = self.read_uint8()
+            result |= <object>(byte & 0x7F) << bits
+            bits += 7
+        return -result if negative else result
+
+    cpdef object read_struct(self, int depth=0):
+        """Read a nested versioned structure (same layout as sc2reader's read_struct)"""
+        if depth > MAX_STRUCT_DEPTH:
+            raise ValueError(f"Structure nested deeper than {MAX_STRUCT_DEPTH} levels")
+        self.byte_align()
+        cdef int datatype = self.read_uint8()
+        cdef object count
+
+        if datatype == 0x00:  # array
+            count = self.read_vint()
+            if count < 0:
+                raise ValueError(f"Negative array length: {count}")
+            return [self.read_struct(depth + 1) for _ in range(count)]
+        elif datatype == 0x01:  # bitarray
+            return self.read_bits(self.read_vint())
+        elif datatype == 0x02:  # blob
+            return self.read_aligned_bytes(self.read_vint())
+        elif datatype == 0x03:  # choice
+            self.read_vint()
+            return self.read_struct(depth + 1)
+        elif datatype == 0x04:  # optional
+            return self.read_struct(depth + 1) if self.read_uint8() != 0 else None
+        elif datatype == 0x05:  # struct
+            count = self.read_vint()
+            if count < 0:
+                raise ValueError(f"Negative struct field count: {count}")
+            return {self.read_vint(): self.read_struct(depth + 1) for _ in range(count)}
+        elif datatype == 0x06:  # u8
+            return self.read_uint8()
+        elif datatype == 0x07:  # u32
+            return self.read_aligned_bytes(4)
+        elif datatype == 0x08:  # u64
+            return int.from_bytes(self.read_aligned_bytes(8), 'big')
+        elif datatype == 0x09:  # vint
+            return self.read_vint()
+
+        raise TypeError(f"Unknown data structure: {datatype}")
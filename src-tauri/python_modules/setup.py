@@ -0,0 +1,17 @@
+"""
+Build the optional compiled BitPackedDecoder in place:
+
+    cd src-tauri/python_modules
+    pip install cython
+    python setup.py build_ext --inplace
+
+parse_initdata.py falls back to its pure-Python decoder when the
+extension has not been built.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="bitdecoder",
+    ext_modules=cythonize("bitdecoder.pyx", language_level=3),
+)